@@ -1,4 +1,6 @@
 from flask import Flask, render_template, Response, jsonify, stream_with_context
+from sqlalchemy import text
+from waitress import serve
 from config import Config
 from models import db, CountEvent
 from counter import PeopleCounter
@@ -10,26 +12,33 @@ db.init_app(app)
 # Initialize database and YOLO counter
 with app.app_context():
     db.create_all()
+    if db.engine.dialect.name == "sqlite":
+        # WAL lets the event writer commit without blocking readers (persists in the DB file)
+        with db.engine.connect() as conn:
+            conn.execute(text("PRAGMA journal_mode=WAL"))
     people_counter = PeopleCounter(
         camera_index=Config.CAMERA_INDEX,
         model_path=Config.YOLO_MODEL_PATH,
+        engine_path=Config.ENGINE_PATH,
         conf_threshold=Config.CONF_THRESHOLD,
         iou_threshold=Config.IOU_THRESHOLD,
         line_position=Config.LINE_POSITION,
         frame_width=Config.FRAME_WIDTH,
         frame_height=Config.FRAME_HEIGHT,
         skip_frames=Config.SKIP_FRAMES,
+        batch_size=Config.BATCH_SIZE,
+        batch_timeout=Config.BATCH_TIMEOUT,
+        int8=Config.INT8,
     )  # default webcam
 
-
-def current_stats():
-    """Fetch aggregated stats from DB and keep counter object in sync."""
+    # Seed the live count from the last logged event; it is kept in memory afterwards
     last_event = CountEvent.query.order_by(CountEvent.timestamp.desc()).first()
-    lobby_count = last_event.lobby_count if last_event else 0
+    people_counter.lobby_count = last_event.lobby_count if last_event else 0
 
-    people_counter.lobby_count = lobby_count
 
-    return lobby_count
+def current_stats():
+    """Current lobby count, served from the counter without touching the DB."""
+    return people_counter.lobby_count
 
 
 @app.route("/")
@@ -64,4 +73,6 @@ def stats():
 
 
 if __name__ == "__main__":
-    app.run(debug=True)
+    # Threaded production server: every /video_feed viewer holds one thread, and all
+    # of them share the single PeopleCounter producer, so run exactly one process.
+    serve(app, host=Config.HOST, port=Config.PORT, threads=Config.SERVER_THREADS)
@@ -7,12 +7,21 @@ class Config:
     SQLALCHEMY_DATABASE_URI = "sqlite:///" + os.path.join(BASE_DIR, "people_counter.db")
     SQLALCHEMY_TRACK_MODIFICATIONS = False
 
+    # Web server (single process; the camera pipeline is shared by all viewers)
+    HOST = os.getenv("HOST", "127.0.0.1")
+    PORT = int(os.getenv("PORT", 5000))
+    SERVER_THREADS = int(os.getenv("SERVER_THREADS", 16))  # each open video stream uses one
+
     # Camera / detection tuning
     CAMERA_INDEX = int(os.getenv("CAMERA_INDEX", 0))  # 0 = default webcam
     YOLO_MODEL_PATH = os.getenv("YOLO_MODEL_PATH", "yolov8n.pt")
+    ENGINE_PATH = os.getenv("ENGINE_PATH") or None        # exported model cache (default: next to weights)
+    INT8 = os.getenv("INT8", "0") == "1"                   # build an INT8 TensorRT engine (GPU only)
     CONF_THRESHOLD = float(os.getenv("CONF_THRESHOLD", 0.5))
     IOU_THRESHOLD = float(os.getenv("IOU_THRESHOLD", 0.45))
     LINE_POSITION = float(os.getenv("LINE_POSITION", 0.5))  # percent of frame width
     FRAME_WIDTH = int(os.getenv("FRAME_WIDTH", 960))        # lower for less lag
     FRAME_HEIGHT = int(os.getenv("FRAME_HEIGHT", 540))
     SKIP_FRAMES = int(os.getenv("SKIP_FRAMES", 1))          # process every Nth frame (1 = every frame)
+    BATCH_SIZE = int(os.getenv("BATCH_SIZE", 1))            # frames per YOLO forward pass (1 = lowest latency)
+    BATCH_TIMEOUT = float(os.getenv("BATCH_TIMEOUT")) if os.getenv("BATCH_TIMEOUT") else None  # seconds; default from camera FPS
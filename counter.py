@@ -1,93 +1,193 @@
+import atexit
+import os
+import queue
+from datetime import datetime
+
 import cv2
-import math
+import numpy as np
+import threading
+import time
 import torch
+import yaml
+from scipy.optimize import linear_sum_assignment
+from flask import current_app
 from ultralytics import YOLO
 
+try:
+    from turbojpeg import TurboJPEG, TJPF_BGR
+except ImportError:  # optional, falls back to cv2.imencode
+    TurboJPEG = None
+
 from models import db, CountEvent
 
+# Stand-in for "no match" in the assignment cost matrix (inf is not allowed there)
+LARGE_DISTANCE = 1e12
+
+JPEG_QUALITY = 80
+
+# Max consecutive frames that may reuse the previous JPEG when detections are unchanged
+MAX_REUSED_FRAMES = 15
+
+# Inference size; frames are downscaled so their longer side fits this before predict()
+MODEL_IMGSZ = 640
+
+# Count events are written in batches of up to this many, at least once per interval
+EVENT_BATCH_SIZE = 64
+EVENT_FLUSH_INTERVAL = 1.0
+
+# Multipart chunk framing for the MJPEG stream
+FRAME_HEADER = b'--frame\r\nContent-Type: image/jpeg\r\n\r\n'
+FRAME_TRAILER = b'\r\n'
+
+
 class CentroidTracker:
     """
     Lightweight centroid tracker. Keeps IDs alive for a few frames to reduce flicker
-    and re-assigns based on nearest neighbor.
+    and re-assigns with a globally optimal (Hungarian) nearest-neighbor match.
+    Objects live in fixed-size NumPy slots (grown on demand); a slot is free when its id is -1.
     """
-    def __init__(self, max_distance=50, max_disappeared=10):
+    def __init__(self, max_distance=50, max_disappeared=10, capacity=64):
         self.next_id = 0
-        self.objects = {}        # id -> (cx, cy)
-        self.disappeared = {}    # id -> frames since last seen
+        self._ids = np.full(capacity, -1, dtype=np.int32)       # slot -> object id
+        self._xy = np.zeros((capacity, 2), dtype=np.float32)    # slot -> (cx, cy)
+        self._dis = np.zeros(capacity, dtype=np.int16)          # slot -> frames since last seen
         self.max_distance = max_distance
         self.max_disappeared = max_disappeared
 
+    def _grow(self, needed):
+        extra = max(needed, len(self._ids))
+        self._ids = np.concatenate([self._ids, np.full(extra, -1, dtype=np.int32)])
+        self._xy = np.concatenate([self._xy, np.zeros((extra, 2), dtype=np.float32)])
+        self._dis = np.concatenate([self._dis, np.zeros(extra, dtype=np.int16)])
+
     def update(self, detections):
         """
         Args:
-            detections: list of (cx, cy)
+            detections: array-like of (cx, cy), shape (N, 2)
         Returns:
-            objects dict and list mapping each detection index -> object id
+            array of active object ids and int32 array mapping each detection index -> object id
         """
-        assignments = [-1] * len(detections)
-
-        # If no objects currently tracked, register all detections
-        if len(self.objects) == 0:
-            for i, (cx, cy) in enumerate(detections):
-                self.objects[self.next_id] = (cx, cy)
-                self.disappeared[self.next_id] = 0
-                assignments[i] = self.next_id
-                self.next_id += 1
-            return self.objects, assignments
-
-        new_objects = {}
-        used_ids = set()
-
-        # Greedy match detections to existing objects
-        for i, (cx, cy) in enumerate(detections):
-            best_id = None
-            best_dist = float("inf")
-            for obj_id, (ox, oy) in self.objects.items():
-                if obj_id in used_ids:
-                    continue
-                dist = math.hypot(cx - ox, cy - oy)
-                if dist < best_dist and dist < self.max_distance:
-                    best_dist = dist
-                    best_id = obj_id
-
-            if best_id is None:
-                # new object
-                new_objects[self.next_id] = (cx, cy)
-                self.disappeared[self.next_id] = 0
-                assignments[i] = self.next_id
-                used_ids.add(self.next_id)
-                self.next_id += 1
-            else:
-                new_objects[best_id] = (cx, cy)
-                self.disappeared[best_id] = 0
-                assignments[i] = best_id
-                used_ids.add(best_id)
-
-        # Handle disappeared objects
-        for obj_id in self.objects.keys():
-            if obj_id in new_objects:
+        det_xy = np.asarray(detections, dtype=np.float32).reshape(-1, 2)
+        assignments = np.full(len(det_xy), -1, dtype=np.int32)
+
+        active = np.flatnonzero(self._ids >= 0)
+        matched = np.zeros(len(active), dtype=bool)
+
+        if len(active) and len(det_xy):
+            # Pairwise distances between tracked objects (rows) and detections (cols).
+            # The cut-off is checked on squared distances; the matching cost stays
+            # Euclidean, since minimizing summed squares can pick different IDs.
+            diff = self._xy[active, None, :] - det_xy[None, :, :]
+            dist_sq = np.einsum("ijk,ijk->ij", diff, diff)
+            dist = np.sqrt(dist_sq)
+            dist[dist_sq >= self.max_distance ** 2] = LARGE_DISTANCE
+
+            # Globally optimal matching, drop pairs that are too far apart
+            rows, cols = linear_sum_assignment(dist)
+            close = dist[rows, cols] < LARGE_DISTANCE
+            rows, cols = rows[close], cols[close]
+
+            slots = active[rows]
+            self._xy[slots] = det_xy[cols]
+            self._dis[slots] = 0
+            assignments[cols] = self._ids[slots]
+            matched[rows] = True
+
+        # Handle disappeared objects, freeing slots that are gone for too long
+        lost = active[~matched]
+        self._dis[lost] += 1
+        self._ids[lost[self._dis[lost] > self.max_disappeared]] = -1
+
+        # Unmatched detections become new objects
+        new = np.flatnonzero(assignments == -1)
+        if len(new):
+            free = np.flatnonzero(self._ids == -1)
+            if len(free) < len(new):
+                self._grow(len(new) - len(free))
+                free = np.flatnonzero(self._ids == -1)
+            slots = free[:len(new)]
+            new_ids = np.arange(self.next_id, self.next_id + len(new), dtype=np.int32)
+            self.next_id += len(new)
+
+            self._ids[slots] = new_ids
+            self._xy[slots] = det_xy[new]
+            self._dis[slots] = 0
+            assignments[new] = new_ids
+
+        return self._ids[self._ids >= 0], assignments
+
+class _CameraReader(threading.Thread):
+    """
+    Background thread that keeps draining the camera and holds only the latest
+    decoded frame, so inference never works on a stale, driver-buffered frame.
+    """
+    def __init__(self, cap, skip_frames=1):
+        super().__init__(daemon=True)
+        self.cap = cap
+        self.skip_frames = skip_frames
+        self._lock = threading.Lock()
+        self._new_frame = threading.Event()
+        self._latest_frame = None
+        self._latest_index = 0
+
+    def run(self):
+        frame_index = 0
+        while True:
+            # grab() advances the camera without decoding; only decode frames we process
+            if not self.cap.grab():
+                break
+
+            frame_index += 1
+
+            # Optionally drop frames to reduce load
+            if frame_index % self.skip_frames != 0:
                 continue
-            self.disappeared[obj_id] = self.disappeared.get(obj_id, 0) + 1
-            if self.disappeared[obj_id] <= self.max_disappeared:
-                new_objects[obj_id] = self.objects[obj_id]
 
-        self.objects = new_objects
-        return self.objects, assignments
+            success, frame = self.cap.retrieve()
+            if not success:
+                break
+
+            with self._lock:
+                self._latest_frame = frame
+                self._latest_index = frame_index
+                self._new_frame.set()
+
+        self._new_frame.set()  # wake up any waiting consumer
+
+    def read(self, timeout=1.0):
+        """
+        Wait up to timeout seconds for a frame newer than the last one read.
+        Returns:
+            (frame index, frame) or (None, None) on timeout / once the camera stopped
+        """
+        if not self._new_frame.wait(timeout):
+            return None, None
+        with self._lock:
+            self._new_frame.clear()
+            frame, self._latest_frame = self._latest_frame, None
+            return self._latest_index, frame
+
 
 class PeopleCounter:
     def __init__(
         self,
         camera_index=0,
         model_path="yolov8n.pt",
+        engine_path=None,
         conf_threshold=0.5,
         iou_threshold=0.45,
         line_position=0.5,
         frame_width=960,
         frame_height=540,
         skip_frames=1,
+        batch_size=1,
+        batch_timeout=None,
+        int8=False,
     ):
+        self._app = current_app._get_current_object()
         self.device = "cuda" if torch.cuda.is_available() else "cpu"
-        self.model = YOLO(model_path)
+        self.batch_size = max(1, int(batch_size))
+        self.int8 = int8
 
         self.conf_threshold = conf_threshold
         self.iou_threshold = iou_threshold
@@ -99,23 +199,212 @@ class PeopleCounter:
         self.cap = cv2.VideoCapture(camera_index)
         if not self.cap.isOpened():
             raise RuntimeError("Cannot open camera")
-        # Reduce lag and load
+        # Reduce lag and load. MJPG must be set before the size: uncompressed YUYV
+        # at this resolution can saturate USB 2.0 and the driver drops to ~15 FPS.
+        self.cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*"MJPG"))
         self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, frame_width)
         self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, frame_height)
         self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
         self.cap.set(cv2.CAP_PROP_FPS, 30)
 
+        # Seconds to wait for a batch to fill. The camera thread delivers one frame per
+        # interval, so by default wait for batch_size - 1 more intervals plus some slack.
+        if batch_timeout is None:
+            frame_interval = self.skip_frames / (self.cap.get(cv2.CAP_PROP_FPS) or 30)
+            batch_timeout = frame_interval * (self.batch_size - 0.5)
+        self.batch_timeout = batch_timeout
+
+        # Loaded after the camera is open, INT8 calibration samples frames from it
+        self.model = self._load_model(model_path, engine_path)
+
+        self.camera = _CameraReader(self.cap, skip_frames=self.skip_frames)
+        self.camera.start()
+
         self.tracker = CentroidTracker(max_distance=70, max_disappeared=12)
         self.lobby_count = 0
         self.last_seen = {}  # id -> frame index
         self.frame_index = 0
         self.line_margin_px = 12  # keep for visualization
 
+        # Last streamed JPEG, reused while the detections don't change
+        self._last_key = None
+        self._last_count = None
+        self._last_bytes = None
+        self._reused_frames = 0
+
+        # Single producer fanning out the latest multipart chunk to every viewer
+        self._chunk_cond = threading.Condition()
+        self._chunk = None
+        self._chunk_seq = 0
+        self._producer = None
+        self._producer_done = False
+
+        # Count events are committed off the streaming thread
+        self._event_queue = queue.Queue()
+        self._event_writer = threading.Thread(target=self._write_events, daemon=True)
+        self._event_writer.start()
+        atexit.register(self._flush_events)
+
+        # libjpeg-turbo (SIMD) encoder for the stream, if available
+        self._tj = None
+        if TurboJPEG is not None:
+            try:
+                self._tj = TurboJPEG()
+            except (OSError, RuntimeError) as exc:
+                self._app.logger.warning("TurboJPEG unavailable, using OpenCV encoder: %s", exc)
+
+    def _load_model(self, model_path, engine_path=None):
+        """
+        Load YOLO weights, exporting them once to an optimized runtime.
+        On CUDA this is a TensorRT engine (INT8 if enabled, else FP16), on CPU an OpenVINO model.
+        Falls back to FP16 if the INT8 build fails, and to the plain PyTorch weights
+        if export is not possible at all.
+        """
+        model = YOLO(model_path)
+        if not model_path.endswith(".pt"):
+            # Already an exported model (engine / openvino / onnx)
+            return self._tune_torch_model(model)
+
+        base = os.path.splitext(model_path)[0]
+        candidates = []  # (target path, export args), best first
+        if self.device == "cuda":
+            engine_args = dict(format="engine", imgsz=MODEL_IMGSZ, device=0,
+                               dynamic=self.batch_size > 1, batch=self.batch_size)
+            # Batch size in the name, so a model built for another BATCH_SIZE is never reused
+            fp16_target = engine_path or f"{base}_b{self.batch_size}.engine"
+            if self.int8:
+                int8_target = os.path.splitext(fp16_target)[0] + "_int8.engine"
+                candidates.append((int8_target, dict(engine_args, int8=True, workspace=4)))
+            candidates.append((fp16_target, dict(engine_args, half=True)))
+        else:
+            target = engine_path or f"{base}_b{self.batch_size}_openvino_model"
+            candidates.append((target, dict(format="openvino", imgsz=MODEL_IMGSZ, half=True,
+                                            dynamic=self.batch_size > 1, batch=self.batch_size)))
+
+        for target, export_args in candidates:
+            if not os.path.exists(target):
+                if export_args.get("int8"):
+                    try:
+                        export_args["data"] = self._collect_calibration_data(
+                            os.path.join(os.path.dirname(os.path.abspath(model_path)), "calib_images"),
+                            model.names,
+                        )
+                    except (RuntimeError, OSError, cv2.error):
+                        self._app.logger.exception("Collecting INT8 calibration frames failed")
+                        continue
+                try:
+                    exported = model.export(**export_args)
+                except Exception:
+                    self._app.logger.exception("Model export to %s failed", target)
+                    continue
+                if exported and os.path.abspath(str(exported)) != os.path.abspath(target):
+                    os.replace(str(exported), target)
+            return YOLO(target, task="detect")
+
+        self._app.logger.warning("No exported model available, using PyTorch weights")
+        return self._tune_torch_model(model)
+
+    def _collect_calibration_data(self, root, names, num_frames=500, every_nth=3):
+        """
+        Save frames from the camera as an INT8 calibration set, so quantization is
+        tuned to this scene. Reuses an existing set. Returns the dataset yaml path.
+        """
+        image_dir = os.path.join(root, "images")
+        os.makedirs(image_dir, exist_ok=True)
+        existing = set(os.listdir(image_dir))
+        saved = len(existing)
+        next_index = 0
+        grabbed = 0
+        while saved < num_frames:
+            success, frame = self.cap.read()
+            if not success:
+                raise RuntimeError("Camera stopped while collecting calibration frames")
+            grabbed += 1
+            if grabbed % every_nth != 0:
+                continue
+            # Next unused name, so frames from an earlier partial set are never overwritten
+            while f"{next_index:04d}.jpg" in existing:
+                next_index += 1
+            name = f"{next_index:04d}.jpg"
+            cv2.imwrite(os.path.join(image_dir, name), frame)
+            existing.add(name)
+            saved += 1
+
+        data_path = os.path.join(root, "calib.yaml")
+        with open(data_path, "w") as f:
+            yaml.safe_dump({"path": root, "train": "images", "val": "images", "names": dict(names)}, f)
+        return data_path
+
+    def _tune_torch_model(self, model):
+        """Speed-ups for the plain PyTorch path (no-op for exported models)."""
+        if isinstance(model.model, torch.nn.Module) and self.device == "cuda":
+            # Only a few input shapes occur (640 px, batch 1..batch_size), so cuDNN
+            # autotunes each of them once and reuses the fastest kernels
+            torch.backends.cudnn.benchmark = True
+        return model
+
+    def _encode_jpeg(self, frame):
+        """Encode a BGR frame as JPEG. Returns a bytes-like object or None."""
+        if self._tj is not None:
+            return self._tj.encode(frame, quality=JPEG_QUALITY, pixel_format=TJPF_BGR)
+        ret, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY])
+        if not ret:
+            return None
+        return memoryview(buffer)  # no copy, it is joined into the multipart chunk
+
     def _log_event(self):
-        """Save lobby presence snapshot to database when count changes."""
-        event = CountEvent(direction="PRESENT", lobby_count=self.lobby_count)
-        db.session.add(event)
-        db.session.commit()
+        """Queue a lobby presence snapshot for the database when count changes."""
+        self._event_queue.put(CountEvent(
+            direction="PRESENT",
+            lobby_count=self.lobby_count,
+            timestamp=datetime.utcnow(),
+        ))
+
+    def _write_events(self):
+        """Background worker that commits queued count events in batches until told to stop."""
+        stopping = False
+        while not stopping:
+            event = self._event_queue.get()
+            stopping = event is None
+            events = [] if stopping else [event]
+            deadline = time.monotonic() + EVENT_FLUSH_INTERVAL
+            while not stopping and len(events) < EVENT_BATCH_SIZE:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    event = self._event_queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if event is None:
+                    stopping = True
+                else:
+                    events.append(event)
+
+            if stopping:
+                # Shutting down: also take whatever was queued after the stop marker
+                while True:
+                    try:
+                        event = self._event_queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if event is not None:
+                        events.append(event)
+
+            if not events:
+                continue
+            with self._app.app_context():
+                try:
+                    db.session.bulk_save_objects(events)
+                    db.session.commit()
+                except Exception:
+                    db.session.rollback()
+                    self._app.logger.exception("Failed to save %d count events", len(events))
+
+    def _flush_events(self, timeout=5.0):
+        """Stop the event writer at exit, committing everything still queued."""
+        self._event_queue.put(None)
+        self._event_writer.join(timeout)
 
     def _cleanup_stale_ids(self, active_ids):
         """Drop old memory for objects that disappeared long time ago."""
@@ -128,82 +417,172 @@ class PeopleCounter:
         for obj_id in stale:
             self.last_seen.pop(obj_id, None)
 
-    def generate_frames(self):
+    def _collect_batch(self):
+        """
+        Gather up to batch_size fresh frames from the camera thread.
+        Stops early once batch_timeout has passed since the first frame.
+        Returns:
+            list of (frame index, frame); empty once the camera stopped
+        """
+        pending = []
+        deadline = None
+        while len(pending) < self.batch_size:
+            timeout = 1.0 if deadline is None else deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            frame_index, frame = self.camera.read(timeout)
+            if frame is None:
+                if not self.camera.is_alive() or pending:
+                    break
+                continue
+            pending.append((frame_index, frame))
+            if deadline is None:
+                deadline = time.monotonic() + self.batch_timeout
+        return pending
+
+    def _model_input(self, frame):
+        """Downscale a frame so its longer side fits the model size, to send less data to the GPU."""
+        h, w = frame.shape[:2]
+        if max(h, w) <= MODEL_IMGSZ:
+            return frame
+        s = MODEL_IMGSZ / max(h, w)
+        size = (max(1, int(round(w * s))), max(1, int(round(h * s))))
+        return cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+
+    def _process_frame(self, frame, result):
+        """Track, count and draw one frame. Returns JPEG bytes or None."""
+        h, w = frame.shape[:2]
+
+        # Filter, rescale and compute centroids on the model's device, then copy
+        # everything to the host in one transfer. Boxes are relative to the
+        # downscaled model input, so they are mapped back to full-res here.
+        xyxy, conf = result.boxes.xyxy, result.boxes.conf
+        keep = conf >= self.conf_threshold
+        small_h, small_w = result.orig_shape[:2]
+        # Scale with Python scalars; a per-frame scale tensor would be a host->device copy
+        xyxy = xyxy[keep]  # boolean indexing returns a copy, safe to scale in place
+        xyxy[:, 0::2] *= w / small_w
+        xyxy[:, 1::2] *= h / small_h
+        centroids = (xyxy[:, :2] + xyxy[:, 2:]) * 0.5
+        packed = torch.cat((xyxy, centroids, conf[keep, None]), dim=1).cpu().numpy()
+
+        boxes = packed[:, :4].astype(np.int32)
+        cx = packed[:, 4].astype(np.int32)
+        cy = packed[:, 5].astype(np.int32)
+        confs = packed[:, 6]
+
+        detections = np.column_stack((cx, cy))  # centroids
+
+        active_ids, assignments = self.tracker.update(detections)
+        active_ids = set(active_ids.tolist())
+        self._cleanup_stale_ids(active_ids)
+
+        # Every detection has an ID from the tracker
+        self.last_seen.update(dict.fromkeys(assignments.tolist(), self.frame_index))
+
+        # Update lobby count based on active IDs (people currently visible)
+        current_lobby = len(active_ids)
+        if current_lobby != self.lobby_count:
+            self.lobby_count = current_lobby
+            self._log_event()
+
+        # Static scene: reuse the last JPEG if boxes (to ~8 px), IDs and count are unchanged.
+        # Still re-render every MAX_REUSED_FRAMES so the live view doesn't freeze.
+        key = hash(((boxes >> 3).tobytes(), assignments.tobytes()))
+        if (key == self._last_key and self.lobby_count == self._last_count
+                and self._reused_frames < MAX_REUSED_FRAMES):
+            self._reused_frames += 1
+            return self._last_bytes
+
+        # Draw vertical line (visual guide only)
+        line_x = int(w * self.line_position)
+        cv2.line(frame, (line_x, 0), (line_x, h), (90, 200, 255), 2)
+
+        # Go through detections with assigned IDs
+        for (x1, y1, x2, y2), x, y, conf, obj_id in zip(boxes.tolist(), cx.tolist(), cy.tolist(),
+                                                        confs.tolist(), assignments.tolist()):
+            cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 200, 0), 2)
+            cv2.circle(frame, (x, y), 4, (0, 0, 255), -1)
+            label = f"ID {obj_id} {conf:.2f}"
+            cv2.putText(frame, label, (x1, max(20, y1 - 8)),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 200, 0), 2)
+
+        # Draw counts overlay
+        cv2.putText(frame, f"In Lobby: {self.lobby_count}", (10, 40),
+                    cv2.FONT_HERSHEY_SIMPLEX, 1.1, (0, 200, 0), 2)
+
+        # Encode frame as JPEG
+        frame_bytes = self._encode_jpeg(frame)
+        if frame_bytes is not None:
+            self._last_key = key
+            self._last_count = self.lobby_count
+            self._last_bytes = frame_bytes
+            self._reused_frames = 0
+        return frame_bytes
+
+    def _produce_frames(self):
         """Generator that yields JPEG frames with boxes and counters drawn."""
         while True:
-            success, frame = self.cap.read()
-            if not success:
+            # Always work on the freshest frames from the camera thread
+            pending = self._collect_batch()
+            if not pending:
                 break
 
-            self.frame_index += 1
-            h, w = frame.shape[:2]
-            line_x = int(w * self.line_position)
-
-            # Optionally drop frames to reduce load
-            if self.frame_index % self.skip_frames != 0:
-                continue
+            # YOLO person detection, one forward pass for the whole batch
+            with torch.inference_mode():
+                results = self.model.predict(
+                    [self._model_input(frame) for _, frame in pending],
+                    classes=[0],  # person class
+                    device=self.device,
+                    conf=self.conf_threshold,
+                    iou=self.iou_threshold,
+                    imgsz=MODEL_IMGSZ,
+                    verbose=False,
+                )
 
-            # YOLO person detection
-            results = self.model.predict(
-                frame,
-                classes=[0],  # person class
-                device=self.device,
-                conf=self.conf_threshold,
-                iou=self.iou_threshold,
-                imgsz=640,
-                verbose=False,
-            )
-
-            detections = []  # centroids
-            boxes_list = []
-
-            for r in results:
-                for box in r.boxes:
-                    conf = float(box.conf[0])
-                    if conf < self.conf_threshold:
-                        continue
-                    x1, y1, x2, y2 = box.xyxy[0].cpu().numpy().astype(int)
-                    cx = int((x1 + x2) / 2)
-                    cy = int((y1 + y2) / 2)
-                    detections.append((cx, cy))
-                    boxes_list.append((x1, y1, x2, y2, cx, cy, conf))
-
-            objects, assignments = self.tracker.update(detections)
-            active_ids = set(objects.keys())
-            self._cleanup_stale_ids(active_ids)
-
-            # Update lobby count based on active IDs (people currently visible)
-            current_lobby = len(active_ids)
-            if current_lobby != self.lobby_count:
-                self.lobby_count = current_lobby
-                self._log_event()
-
-            # Draw vertical line (visual guide only)
-            cv2.line(frame, (line_x, 0), (line_x, h), (90, 200, 255), 2)
-
-            # Go through detections with assigned IDs
-            for (x1, y1, x2, y2, cx, cy, conf), obj_id in zip(boxes_list, assignments):
-                if obj_id == -1:
+            for (frame_index, frame), result in zip(pending, results):
+                self.frame_index = frame_index
+                frame_bytes = self._process_frame(frame, result)
+                if frame_bytes is None:
                     continue
 
-                self.last_seen[obj_id] = self.frame_index
-
-                cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 200, 0), 2)
-                cv2.circle(frame, (cx, cy), 4, (0, 0, 255), -1)
-                label = f"ID {obj_id} {conf:.2f}"
-                cv2.putText(frame, label, (x1, max(20, y1 - 8)),
-                            cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 200, 0), 2)
+                # HTTP multipart chunk; a single join is the only copy of the JPEG
+                yield b''.join((FRAME_HEADER, frame_bytes, FRAME_TRAILER))
 
-            # Draw counts overlay
-            cv2.putText(frame, f"In Lobby: {self.lobby_count}", (10, 40),
-                        cv2.FONT_HERSHEY_SIMPLEX, 1.1, (0, 200, 0), 2)
+    def _broadcast(self):
+        """Producer thread: runs the pipeline once and publishes each chunk to all viewers."""
+        try:
+            for chunk in self._produce_frames():
+                with self._chunk_cond:
+                    self._chunk = chunk
+                    self._chunk_seq += 1
+                    self._chunk_cond.notify_all()
+        finally:
+            with self._chunk_cond:
+                self._producer_done = True
+                self._chunk_cond.notify_all()
 
-            # Encode frame as JPEG
-            ret, buffer = cv2.imencode('.jpg', frame)
-            if not ret:
-                continue
-            frame_bytes = buffer.tobytes()
+    def _ensure_producer(self):
+        with self._chunk_cond:
+            if self._producer is None:
+                self._producer = threading.Thread(target=self._broadcast, daemon=True)
+                self._producer.start()
 
-            # Yield as HTTP multipart
-            yield (b'--frame\r\n'
-                   b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
+    def generate_frames(self):
+        """
+        Generator that yields multipart JPEG chunks for one viewer.
+        All viewers share a single producer; slow viewers skip to the newest frame
+        instead of holding the pipeline back.
+        """
+        self._ensure_producer()
+        seen = 0
+        while True:
+            with self._chunk_cond:
+                self._chunk_cond.wait_for(
+                    lambda: self._chunk_seq != seen or self._producer_done, timeout=1.0)
+                if self._chunk_seq == seen:
+                    if self._producer_done:
+                        return
+                    continue
+                seen, chunk = self._chunk_seq, self._chunk
+            yield chunk